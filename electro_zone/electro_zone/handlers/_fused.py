@@ -0,0 +1,56 @@
+"""
+Fused doc_events entry points for electro_zone app
+
+Each function runs the handlers for one (doctype, event) pair in the same order
+they were registered in hooks.py, so Frappe resolves a single dotted path per
+event instead of one per handler. Sales Order and Delivery Note handlers are called
+from the controller overrides in electro_zone.electro_zone.overrides instead.
+"""
+
+from electro_zone.electro_zone.handlers.payment_entry import (
+	balance_topup_and_refund_handler,
+	update_so_on_payment,
+)
+from electro_zone.electro_zone.handlers.purchase_order import (
+	auto_sync_standard_buying_on_item_add,
+	sync_price_edit_status,
+	validate_supplier_items,
+)
+from electro_zone.electro_zone.handlers.sales_invoice import (
+	auto_allocate_balance,
+	update_so_billing_status_only,
+)
+
+
+def po_validate(doc, method=None):
+	"""Purchase Order validate handlers.
+
+	Args:
+		doc: Purchase Order document
+		method: Event method name
+	"""
+	validate_supplier_items(doc, method)
+	auto_sync_standard_buying_on_item_add(doc, method)
+	sync_price_edit_status(doc, method)
+
+
+def pe_on_submit(doc, method=None):
+	"""Payment Entry on_submit handlers.
+
+	Args:
+		doc: Payment Entry document
+		method: Event method name
+	"""
+	balance_topup_and_refund_handler(doc, method)
+	update_so_on_payment(doc, method)
+
+
+def si_on_submit(doc, method=None):
+	"""Sales Invoice on_submit handlers.
+
+	Args:
+		doc: Sales Invoice document
+		method: Event method name
+	"""
+	auto_allocate_balance(doc, method)
+	update_so_billing_status_only(doc, method)
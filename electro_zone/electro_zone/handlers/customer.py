@@ -179,6 +179,15 @@ def validate_phone_uniqueness(doc, _method=None):
 		# Phone is optional - skip validation
 		return
 
+	# Skip if this customer/address/phone was already validated in this request
+	validated = getattr(frappe.local, "ez_phone_checked", None)
+	if validated is None:
+		validated = frappe.local.ez_phone_checked = set()
+
+	memo_key = (doc.name, primary_address, phone)
+	if memo_key in validated:
+		return
+
 	# STEP 3: Remove spaces and formatting for consistent comparison
 	phone_clean = phone.replace(" ", "").replace("-", "").replace("(", "").replace(")", "")
 
@@ -214,6 +223,7 @@ def validate_phone_uniqueness(doc, _method=None):
 				)
 
 	# STEP 6: Success - validation passed
+	validated.add(memo_key)
 	frappe.msgprint(
 		f"✓ Phone number '{phone}' validated successfully on Primary Address ({primary_address})", alert=True
 	)
@@ -120,22 +120,15 @@ def release_reserved_balance(customer, so_name):
 			frappe.db.commit()
 			return {"success": True, "message": "No balance was reserved for this SO", "released_amount": 0}
 
-		# Lock customer record
-		reserved_balance = frappe.db.sql(
+		# Release the reserved amount in a single atomic UPDATE (no read-modify-write race)
+		frappe.db.sql(
 			"""
-			SELECT custom_reserved_balance
-			FROM `tabCustomer`
+			UPDATE `tabCustomer`
+			SET custom_reserved_balance = GREATEST(0, IFNULL(custom_reserved_balance, 0) - %s)
 			WHERE name=%s
-			FOR UPDATE
 			""",
-			(customer,),
-		)[0][0] or 0.0
-
-		# Release the reserved amount
-		new_reserved_balance = max(0, reserved_balance - so_reserved)
-
-		# Update customer reserved balance
-		frappe.db.set_value("Customer", customer, "custom_reserved_balance", new_reserved_balance, update_modified=False)
+			(so_reserved, customer),
+		)
 
 		# Create ledger entry
 		create_ledger_entry(
@@ -149,7 +142,7 @@ def release_reserved_balance(customer, so_name):
 
 		frappe.db.commit()
 
-		return {"success": True, "released_amount": so_reserved, "new_reserved_balance": new_reserved_balance}
+		return {"success": True, "released_amount": so_reserved}
 
 	except Exception as e:
 		
@@ -466,14 +459,14 @@ def create_ledger_entry(customer, debit, credit, reference_doctype, reference_na
 		reference_name: Reference document name
 		remarks: Entry remarks
 	"""
-	# Get customer details
-	customer_doc = frappe.get_doc("Customer", customer)
-	customer_name = customer_doc.customer_name
+	# Get customer details (only the two fields needed, not the full Customer doc)
+	customer_name, primary_address = frappe.get_cached_value(
+		"Customer", customer, ["customer_name", "customer_primary_address"]
+	) or (None, None)
 	company = frappe.defaults.get_user_default("Company") or frappe.db.get_value("Company", filters={}, fieldname="name")
 
-	# Get primary address and phone
-	primary_address = customer_doc.get("customer_primary_address")
-	phone = frappe.db.get_value("Address", primary_address, "phone") if primary_address else None
+	# Get primary address phone
+	phone = frappe.get_cached_value("Address", primary_address, "phone") if primary_address else None
 
 	# DISABLED: custom_current_balance functionality
 	# Get current balance and calculate running balance
@@ -8,6 +8,9 @@ maintainability, testing, and version control.
 import frappe
 import frappe.utils
 
+from electro_zone.electro_zone.handlers.item import refresh_item_stock_fields
+from electro_zone.electro_zone.handlers.warehouse import get_hold_warehouse
+
 
 # ============================================================================
 # API METHODS (Whitelisted for client-side access)
@@ -50,14 +53,12 @@ def receive_dn_return(dn_return_name=None):
 	original_si_name = sales_invoices[0].parent
 
 	# Check if Credit Note already exists
-	existing_credit_note = frappe.db.get_all(
-		"Sales Invoice",
-		filters={"is_return": 1, "return_against": original_si_name, "docstatus": ["in", [0, 1]]},
-		limit=1,
+	existing_credit_note = frappe.db.exists(
+		"Sales Invoice", {"is_return": 1, "return_against": original_si_name, "docstatus": ["in", [0, 1]]}
 	)
 
 	if existing_credit_note:
-		return {"success": False, "message": f"Credit Note already exists: {existing_credit_note[0].name}"}
+		return {"success": False, "message": f"Credit Note already exists: {existing_credit_note}"}
 
 	try:
 		# STEP 1: Get original source warehouse from Sales Order
@@ -174,22 +175,11 @@ def receive_dn_return(dn_return_name=None):
 # ============================================================================
 
 
-# Warehouse field mappings (used across multiple handlers)
-WAREHOUSE_FIELDS = {
-	"custom_stock_store_display": "Store Display - EZ",
-	"custom_stock_store_warehouse": "Store Warehouse - EZ",
-	"custom_stock_damage": "Damage - EZ",
-	"custom_stock_damage_for_sale": "Damage For Sale - EZ",
-	"custom_stock_zahran_main": "Zahran Main - EZ",
-	"custom_stock_hold": "Hold (Reserved / Pending Shipment) - EZ",
-}
-
-
 def update_item_stock_fields(doc, method=None):
 	"""Update Item warehouse stock fields after Delivery Note submission.
 
 	Updates custom stock display fields on Item master for multiple warehouses
-	using robust stock fetching from Bin table.
+	from the Bin table (one batched query for all items and warehouses).
 
 	Event: After Submit
 
@@ -197,28 +187,7 @@ def update_item_stock_fields(doc, method=None):
 		doc: Delivery Note document
 		method: Event method name (unused, required by Frappe hook signature)
 	"""
-	# Get all unique item codes from this delivery note
-	item_codes = set()
-	for item in doc.items:
-		if item.item_code:
-			item_codes.add(item.item_code)
-
-	# Update stock fields for each item
-	for item_code in item_codes:
-		if frappe.db.exists("Item", item_code):
-			for field_name, warehouse_name in WAREHOUSE_FIELDS.items():
-				bin_data = frappe.db.sql(
-					"""
-					SELECT actual_qty
-					FROM `tabBin`
-					WHERE item_code = %s AND warehouse = %s
-				""",
-					(item_code, warehouse_name),
-					as_dict=1,
-				)
-
-				actual_qty = bin_data[0].actual_qty if bin_data else 0
-				frappe.db.set_value("Item", item_code, field_name, actual_qty, update_modified=False)
+	refresh_item_stock_fields(_get_submit_context(doc)["item_codes"], "Delivery Note")
 
 
 def validate_sales_order_reference(doc, method=None):
@@ -335,11 +304,7 @@ def create_reference_ledger_entry(doc, method=None):
 		current_balance = frappe.db.get_value("Customer", customer, "custom_current_balance") or 0.0
 
 		# Find linked Sales Order
-		sales_order = None
-		for item in doc.items:
-			if item.get("against_sales_order"):
-				sales_order = item.against_sales_order
-				break
+		sales_order = _get_submit_context(doc)["sales_order"]
 
 		# Create REFERENCE-ONLY ledger entry
 		ledger = frappe.new_doc("Customer Balance Ledger")
@@ -401,9 +366,11 @@ def auto_close_so_on_cancel(doc, method=None):
 
 
 def auto_invoice_on_out_for_delivery(doc, method=None):
-	"""Auto-create Sales Invoice when DN is submitted with "Out for Delivery" state.
+	"""Auto-create Sales Invoice when DN is submitted with "Delivered" state.
 
-	Includes retry logic to handle Payment Entry concurrency conflicts.
+	The Sales Invoice is created by _auto_invoice_worker on the short queue once the
+	DN submit commits, so invoice creation and payment allocation do not hold the
+	submit transaction open.
 
 	Event: After Submit
 
@@ -412,115 +379,28 @@ def auto_invoice_on_out_for_delivery(doc, method=None):
 		method: Event method name (unused, required by Frappe hook signature)
 	"""
 	# Only process when DN moves to "Delivered" state (non-return DNs)
-	if doc.workflow_state == "Delivered" and doc.is_return != 1:
-		# Check if invoice already exists
-		existing = frappe.db.exists("Sales Invoice Item", {"delivery_note": doc.name, "docstatus": ["!=", 2]})
-
-		if existing:
-			frappe.msgprint(f"Sales Invoice already exists for DN {doc.name}", indicator="orange")
-		else:
-			# Retry logic to handle concurrency conflicts
-			max_retries = 3
-			retry_count = 0
-			success = False
-			last_error = None
-
-			while retry_count < max_retries and not success:
-				try:
-					# Create Sales Invoice (as Draft - SI script will handle submission)
-					si = frappe.new_doc("Sales Invoice")
-					si.customer = doc.customer
-					si.posting_date = frappe.utils.nowdate()
-					si.company = doc.company
-
-					# Copy items
-					for dn_item in doc.items:
-						si.append(
-							"items",
-							{
-								"item_code": dn_item.item_code,
-								"item_name": dn_item.item_name,
-								"description": dn_item.description,
-								"qty": dn_item.qty,
-								"rate": dn_item.rate,
-								"amount": dn_item.amount,
-								"warehouse": dn_item.warehouse,
-								"uom": dn_item.uom,
-								"stock_uom": dn_item.stock_uom,
-								"conversion_factor": dn_item.conversion_factor or 1,
-								"delivery_note": doc.name,
-								"dn_detail": dn_item.name,
-								"sales_order": dn_item.against_sales_order,
-							},
-						)
-
-					# Copy taxes if any
-					for tax in doc.get("taxes", []):
-						si.append(
-							"taxes",
-							{
-								"charge_type": tax.charge_type,
-								"account_head": tax.account_head,
-								"description": tax.description,
-								"rate": tax.get("rate", 0),
-								"tax_amount": tax.tax_amount,
-							},
-						)
-
-					# Insert and submit invoice automatically
-					si.insert(ignore_permissions=True)
-					si.submit()
-
-					# Show success message
-					frappe.msgprint(
-						f"Sales Invoice {si.name} created and submitted automatically.<br>"
-						"Payment processing completed via SI After Submit script.",
-						alert=True,
-						indicator="green",
-						title="Invoice Submitted",
-					)
-
-					# Add comment to DN
-					doc.add_comment("Comment", f"Sales Invoice {si.name} auto-created from Delivery Note {doc.name}")
-
-					# Mark as successful
-					success = True
-
-				except Exception as e:
-					last_error = str(e)
-					retry_count += 1
-
-					# Check if it's a concurrency error that we can retry
-					is_concurrency_error = (
-						"modified after you pulled" in last_error
-						or "has been modified" in last_error
-						or "TimestampMismatchError" in last_error
-					)
+	if doc.workflow_state != "Delivered" or doc.is_return == 1:
+		return
+
+	# Check if invoice already exists
+	if frappe.db.exists("Sales Invoice Item", {"delivery_note": doc.name, "docstatus": ["!=", 2]}):
+		frappe.msgprint(f"Sales Invoice already exists for DN {doc.name}", indicator="orange")
+		return
+
+	frappe.enqueue(
+		"electro_zone.electro_zone.handlers.delivery_note._auto_invoice_worker",
+		queue="short",
+		enqueue_after_commit=True,
+		delivery_note=doc.name,
+		user=frappe.session.user,
+	)
 
-					if is_concurrency_error and retry_count < max_retries:
-						# Log retry attempt
-						frappe.log_error(
-							f"Retry {retry_count}/{max_retries} for DN {doc.name}: {last_error}", "DN Auto Invoice Retry"
-						)
-						# Wait briefly before retry
-						frappe.db.sql("SELECT SLEEP(0.5)")
-						continue
-					else:
-						break
-
-			# Handle final result
-			if not success:
-				frappe.log_error(
-					f"Auto SI creation failed after {retry_count} retries: {last_error}", "DN Auto Invoice Error"
-				)
-				frappe.msgprint(
-					f"❌ Failed to create Sales Invoice after {retry_count} retries.<br>"
-					f"Error: {last_error}<br><br>"
-					"Please try again or contact administrator.",
-					alert=True,
-					indicator="red",
-					title="Invoice Creation Failed",
-				)
+	frappe.msgprint(
+		"Sales Invoice creation queued. You will be notified when it completes.",
+		alert=True,
+		indicator="blue",
+		title="Invoice Queued",
+	)
 
 
 def auto_return_stock_on_delivery_failed(doc, method=None):
@@ -549,11 +429,7 @@ def auto_return_stock_on_delivery_failed(doc, method=None):
 			# Only proceed if not already processed
 			if not already_processed:
 				# Get linked Sales Order to retrieve original source warehouse
-				so_name = None
-				for item in doc.items:
-					if item.get("against_sales_order"):
-						so_name = item.against_sales_order
-						break
+				so_name = _get_submit_context(doc)["sales_order"]
 
 				if not so_name:
 					frappe.throw("Cannot find linked Sales Order. Cannot determine source warehouse.")
@@ -565,9 +441,7 @@ def auto_return_stock_on_delivery_failed(doc, method=None):
 					frappe.throw(f"Source warehouse not found on Sales Order {so_name}. Cannot return stock.")
 
 				# Find Hold warehouse
-				hold_warehouse = frappe.db.get_value(
-					"Warehouse", {"warehouse_name": ["like", "%Hold%"], "company": doc.company, "is_group": 0}, "name"
-				)
+				hold_warehouse = get_hold_warehouse(doc.company)
 
 				if not hold_warehouse:
 					frappe.throw(f"Hold warehouse not found for company {doc.company}. Cannot return stock.")
@@ -639,3 +513,182 @@ def auto_return_stock_on_delivery_failed(doc, method=None):
 				except Exception as e:
 					frappe.log_error(f"Failed to return stock or cancel DN {doc.name}: {str(e)}")
 					frappe.throw(f"Failed to process Delivery Failed: {str(e)}")
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+
+def _get_submit_context(doc):
+	"""Get values derived from doc.items that several on_submit handlers need.
+
+	Built with a single pass over the items on first use and kept on doc._ez_cache,
+	so the handlers run by ElectroZoneDeliveryNote.on_submit share it.
+
+	Args:
+		doc: Delivery Note document
+
+	Returns:
+		dict: item_codes (set of item codes) and sales_order (first linked SO or None)
+	"""
+	context = getattr(doc, "_ez_cache", None)
+	if context is None:
+		item_codes = set()
+		sales_order = None
+		for item in doc.items:
+			if item.item_code:
+				item_codes.add(item.item_code)
+			if not sales_order and item.get("against_sales_order"):
+				sales_order = item.against_sales_order
+
+		context = doc._ez_cache = {"item_codes": item_codes, "sales_order": sales_order}
+
+	return context
+
+
+# ============================================================================
+# BACKGROUND JOBS
+# ============================================================================
+
+
+def _auto_invoice_worker(delivery_note, user=None):
+	"""Background job: create and submit the Sales Invoice for a delivered DN.
+
+	Includes retry logic to handle Payment Entry concurrency conflicts.
+
+	Args:
+		delivery_note: Delivery Note name
+		user: User to notify when the job finishes
+	"""
+	doc = frappe.get_doc("Delivery Note", delivery_note)
+
+	# DN may have been cancelled before the job ran
+	if doc.docstatus != 1:
+		return
+
+	# Another job or a user may have invoiced the DN in the meantime
+	if frappe.db.exists("Sales Invoice Item", {"delivery_note": doc.name, "docstatus": ["!=", 2]}):
+		return
+
+	# Retry logic to handle concurrency conflicts
+	max_retries = 3
+	retry_count = 0
+	success = False
+	last_error = None
+
+	while retry_count < max_retries and not success:
+		try:
+			# Create Sales Invoice (as Draft - SI script will handle submission)
+			si = frappe.new_doc("Sales Invoice")
+			si.customer = doc.customer
+			si.posting_date = frappe.utils.nowdate()
+			si.company = doc.company
+
+			# Copy items
+			for dn_item in doc.items:
+				si.append(
+					"items",
+					{
+						"item_code": dn_item.item_code,
+						"item_name": dn_item.item_name,
+						"description": dn_item.description,
+						"qty": dn_item.qty,
+						"rate": dn_item.rate,
+						"amount": dn_item.amount,
+						"warehouse": dn_item.warehouse,
+						"uom": dn_item.uom,
+						"stock_uom": dn_item.stock_uom,
+						"conversion_factor": dn_item.conversion_factor or 1,
+						"delivery_note": doc.name,
+						"dn_detail": dn_item.name,
+						"sales_order": dn_item.against_sales_order,
+					},
+				)
+
+			# Copy taxes if any
+			for tax in doc.get("taxes", []):
+				si.append(
+					"taxes",
+					{
+						"charge_type": tax.charge_type,
+						"account_head": tax.account_head,
+						"description": tax.description,
+						"rate": tax.get("rate", 0),
+						"tax_amount": tax.tax_amount,
+					},
+				)
+
+			# Insert and submit invoice automatically
+			si.insert(ignore_permissions=True)
+			si.submit()
+
+			# Add comment to DN
+			doc.add_comment("Comment", f"Sales Invoice {si.name} auto-created from Delivery Note {doc.name}")
+
+			_notify_user(
+				user,
+				f"Sales Invoice {si.name} created and submitted automatically.<br>"
+				"Payment processing completed via SI After Submit script.",
+				"Invoice Submitted",
+				"green",
+			)
+
+			# Mark as successful
+			success = True
+
+		except Exception as e:
+			# Discard the partially created invoice before retrying
+			frappe.db.rollback()
+			last_error = str(e)
+			retry_count += 1
+
+			# Check if it's a concurrency error that we can retry
+			is_concurrency_error = (
+				"modified after you pulled" in last_error
+				or "has been modified" in last_error
+				or "TimestampMismatchError" in last_error
+			)
+
+			if is_concurrency_error and retry_count < max_retries:
+				# Log retry attempt
+				frappe.log_error(
+					f"Retry {retry_count}/{max_retries} for DN {doc.name}: {last_error}", "DN Auto Invoice Retry"
+				)
+				# Wait briefly before retry
+				frappe.db.sql("SELECT SLEEP(0.5)")
+				continue
+			else:
+				break
+
+	# Handle final result
+	if not success:
+		frappe.log_error(f"Auto SI creation failed after {retry_count} retries: {last_error}", "DN Auto Invoice Error")
+		_notify_user(
+			user,
+			f"❌ Failed to create Sales Invoice for DN {doc.name} after {retry_count} retries.<br>"
+			f"Error: {last_error}<br><br>"
+			"Please try again or contact administrator.",
+			"Invoice Creation Failed",
+			"red",
+		)
+
+
+def _notify_user(user, message, title, indicator):
+	"""Show a msgprint to the user who triggered a background job.
+
+	Args:
+		user: User to notify (nothing is sent if empty)
+		message: Message HTML
+		title: Dialog title
+		indicator: Indicator colour
+	"""
+	if not user:
+		return
+
+	frappe.publish_realtime(
+		"msgprint",
+		{"message": message, "title": title, "indicator": indicator},
+		user=user,
+		after_commit=True,
+	)
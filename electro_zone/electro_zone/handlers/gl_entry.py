@@ -17,21 +17,14 @@ def sync_customer_balance_on_gl_submit(doc, _method=None):
 		_method: Event method name (unused, required by Frappe hook signature)
 	"""
 	# Only process Customer party type
-	if doc.party_type == "Customer" and doc.party:
-		try:
-			# Get company from GL Entry
-			company = doc.company
+	if doc.party_type != "Customer" or not doc.party:
+		return
 
-			# Sync balance from GL
-			sync_balance_from_gl(customer=doc.party, company=company)
-
-			frappe.logger().info(f"Auto-synced balance for customer {doc.party} via GL Entry {doc.name}")
-
-		except Exception as e:
-			# Log error but don't block GL Entry submission
-			frappe.log_error(
-				f"Failed to auto-sync balance for customer {doc.party}: {str(e)}", "GL Balance Sync Error"
-			)
+	_sync_impl(
+		doc,
+		f"Auto-synced balance for customer {doc.party} via GL Entry {doc.name}",
+		f"Failed to auto-sync balance for customer {doc.party}",
+	)
 
 
 def sync_customer_balance_on_gl_cancel(doc, _method=None):
@@ -45,21 +38,38 @@ def sync_customer_balance_on_gl_cancel(doc, _method=None):
 		_method: Event method name (unused, required by Frappe hook signature)
 	"""
 	# Only process Customer party type
-	if doc.party_type == "Customer" and doc.party:
-		try:
-			# Get company from GL Entry
-			company = doc.company
-
-			# Sync balance from GL
-			sync_balance_from_gl(customer=doc.party, company=company)
-
-			frappe.logger().info(
-				f"Auto-synced balance for customer {doc.party} after GL Entry {doc.name} cancelled"
-			)
-
-		except Exception as e:
-			# Log error but don't block GL Entry cancellation
-			frappe.log_error(
-				f"Failed to auto-sync balance after GL cancel for {doc.party}: {str(e)}",
-				"GL Balance Sync Error",
-			)
+	if doc.party_type != "Customer" or not doc.party:
+		return
+
+	_sync_impl(
+		doc,
+		f"Auto-synced balance for customer {doc.party} after GL Entry {doc.name} cancelled",
+		f"Failed to auto-sync balance after GL cancel for {doc.party}",
+	)
+
+
+def _sync_impl(doc, success_message, error_message):
+	"""Sync the GL Entry party's balance from the General Ledger.
+
+	Errors are logged and swallowed so they never block the GL Entry submit/cancel.
+
+	Args:
+		doc: Customer GL Entry document
+		success_message: Message logged after a successful sync
+		error_message: Error Log message prefix, followed by the exception text
+	"""
+	# Skip re-entry from GL Entries posted while a balance sync is already running
+	if frappe.flags.ez_in_balance_sync:
+		return
+
+	frappe.flags.ez_in_balance_sync = True
+	try:
+		sync_balance_from_gl(customer=doc.party, company=doc.company)
+
+		frappe.logger().info(success_message)
+
+	except Exception as e:
+		frappe.log_error(f"{error_message}: {str(e)}", "GL Balance Sync Error")
+
+	finally:
+		frappe.flags.ez_in_balance_sync = False
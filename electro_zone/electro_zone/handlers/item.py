@@ -3,6 +3,20 @@ Item event handlers for electro_zone app
 """
 
 import frappe
+import frappe.utils
+
+# Item stock display fields (custom_field_name: warehouse_name)
+WAREHOUSE_STOCK_FIELDS = {
+	"custom_stock_store_display": "Store Display - EZ",
+	"custom_stock_store_warehouse": "Store Warehouse - EZ",
+	"custom_stock_damage": "Damage - EZ",
+	"custom_stock_damage_for_sale": "Damage For Sale - EZ",
+	"custom_stock_zahran_main": "Zahran Main - EZ",
+	"custom_stock_hold": "Hold (Reserved / Pending Shipment) - EZ",
+}
+
+# Items written per CASE UPDATE statement in refresh_item_stock_fields
+ITEM_STOCK_UPDATE_BATCH_SIZE = 500
 
 
 # ============================================================================
@@ -131,7 +145,7 @@ def sync_standard_buying_from_item(item_code=None, item_codes=None):
 			updated_count += 1
 
 		except Exception as e:
-			errors.append(f"{code}: {str(e)}")
+			errors.append(f"{code}: {e!s}")
 
 	# Return result
 	if updated_count > 0:
@@ -164,8 +178,12 @@ def auto_assign_supplier_from_brand(doc, method=None):
 		doc: Item document
 		method: Event method name (unused, required by Frappe hook signature)
 	"""
+	# Nothing to do unless the brand was just set or changed
+	if not (doc.is_new() or doc.has_value_changed("brand")):
+		return
+
 	if doc.brand and not doc.get("default_supplier"):
-		supplier = frappe.db.get_value("Brand", doc.brand, "default_supplier")
+		supplier = frappe.get_cached_value("Brand", doc.brand, "default_supplier")
 		if supplier:
 			doc.default_supplier = supplier
 			frappe.msgprint(f"Supplier auto-assigned: {supplier}")
@@ -219,3 +237,84 @@ def validate_uniqueness(doc, method=None):
 			f"Item with Brand '{doc.brand}', Item Group '{doc.item_group}', "
 			f"and Model '{doc.get('custom_item_model')}' already exists: {existing}"
 		)
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+
+def refresh_item_stock_fields(item_codes, log_title_prefix):
+	"""Refresh Item warehouse stock display fields from the Bin table.
+
+	Used by the Delivery Note, Purchase Receipt and Stock Entry submit handlers.
+	Fetches existing Items and all Bin rows for (item_codes x WAREHOUSE_STOCK_FIELDS)
+	in two queries and writes the Items with one CASE UPDATE per
+	ITEM_STOCK_UPDATE_BATCH_SIZE items. Missing Bin rows, including those of a
+	warehouse that does not exist, mean 0 stock. Item.modified is left untouched.
+
+	Args:
+		item_codes: Item codes to refresh
+		log_title_prefix: Error Log title prefix, e.g. "Stock Entry"
+	"""
+	item_codes = list(item_codes)
+	if not item_codes:
+		return
+
+	existing_items = set(frappe.db.get_all("Item", filters={"name": ["in", item_codes]}, pluck="name"))
+
+	bin_rows = frappe.db.sql(
+		"""
+		SELECT item_code, warehouse, actual_qty
+		FROM `tabBin`
+		WHERE item_code IN %(item_codes)s AND warehouse IN %(warehouses)s
+	""",
+		{"item_codes": tuple(item_codes), "warehouses": tuple(WAREHOUSE_STOCK_FIELDS.values())},
+		as_dict=1,
+	)
+	bin_qty = {(row.item_code, row.warehouse): frappe.utils.flt(row.actual_qty) for row in bin_rows}
+
+	missing_items = [item_code for item_code in item_codes if item_code not in existing_items]
+	if missing_items:
+		frappe.log_error(
+			f"Items {', '.join(missing_items)} do not exist in Item master. Skipping stock update.",
+			f"{log_title_prefix} - Item Not Found",
+		)
+
+	update_items = [item_code for item_code in item_codes if item_code in existing_items]
+	if not update_items:
+		return
+
+	# One UPDATE with a CASE per stock field per batch, instead of a set_value per Item
+	for batch in frappe.utils.create_batch(update_items, ITEM_STOCK_UPDATE_BATCH_SIZE):
+		_update_item_stock_batch(batch, bin_qty, log_title_prefix)
+
+
+def _update_item_stock_batch(item_codes, bin_qty, log_title_prefix):
+	"""Write WAREHOUSE_STOCK_FIELDS for a batch of Items with a single CASE UPDATE.
+
+	Args:
+		item_codes: Existing Item codes to update
+		bin_qty: {(item_code, warehouse): actual_qty} map, missing entries mean 0
+		log_title_prefix: Error Log title prefix, e.g. "Stock Entry"
+	"""
+	when_clauses = " ".join(["WHEN %s THEN %s"] * len(item_codes))
+	set_clauses = []
+	values = []
+	for field_name, warehouse_name in WAREHOUSE_STOCK_FIELDS.items():
+		set_clauses.append(f"`{field_name}` = CASE name {when_clauses} END")
+		for item_code in item_codes:
+			values.extend([item_code, bin_qty.get((item_code, warehouse_name), 0)])
+	values.append(tuple(item_codes))
+
+	try:
+		frappe.db.sql(f"UPDATE `tabItem` SET {', '.join(set_clauses)} WHERE name IN %s", values)
+
+		# A raw UPDATE bypasses set_value, so drop the cached Item docs and values here
+		for item_code in item_codes:
+			frappe.clear_document_cache("Item", item_code)
+	except Exception as e:
+		frappe.log_error(
+			f"Failed to update stock fields for Items {', '.join(item_codes)}: {e!s}",
+			f"{log_title_prefix} - Item Update Error",
+		)
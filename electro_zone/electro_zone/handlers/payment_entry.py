@@ -111,33 +111,15 @@ def update_so_on_payment(doc, method=None):
 	if doc.payment_type != PAYMENT_TYPE_RECEIVE or doc.party_type != PARTY_TYPE_CUSTOMER:
 		return
 
-	# Track updated Sales Orders (avoid duplicates)
-	updated_sales_orders = []
-
-	# Check all references in Payment Entry
-	for ref in doc.references:
-		if ref.reference_doctype != "Sales Invoice":
-			continue
-
-		si_name = ref.reference_name
-
-		# Get Sales Order linked to this Sales Invoice
-		so_name = _get_so_from_sales_invoice(si_name)
-
-		if so_name and so_name not in updated_sales_orders:
-			updated_sales_orders.append(so_name)
-
-			try:
-				# Recalculate and update SO billing status
-				update_result = _update_so_billing_status(so_name)
+	# Skip re-entry from documents saved while SO billing status is being updated
+	if frappe.flags.ez_in_so_payment_update:
+		return
 
-				if update_result:
-					_show_so_update_message(so_name, update_result, "Payment")
-
-			except Exception as e:
-				frappe.log_error(
-					f"Failed to update SO billing status for {so_name}: {str(e)}", "PE SO Update Error"
-				)
+	frappe.flags.ez_in_so_payment_update = True
+	try:
+		_update_sales_orders_from_references(doc)
+	finally:
+		frappe.flags.ez_in_so_payment_update = False
 
 
 # ============================================================================
@@ -279,8 +261,9 @@ def _should_skip_auto_allocation(doc) -> bool:
 	Returns:
 		bool: True if should skip, False otherwise
 	"""
-	# Check if auto-created from SO
-	is_auto_created = _is_auto_created_from_so(doc.name)
+	# Check if auto-created from SO (a Payment Entry that is still being inserted
+	# cannot have the marker comment yet, so skip the Comment lookup for it)
+	is_auto_created = not doc.is_new() and _is_auto_created_from_so(doc.name)
 
 	# Check if already has SO reference
 	has_so_reference = any(ref.reference_doctype == "Sales Order" for ref in doc.references or [])
@@ -369,12 +352,12 @@ def _is_auto_created_from_so(pe_name: str) -> bool:
 	Returns:
 		bool: True if auto-created, False otherwise
 	"""
-	comments = frappe.get_all(
-		"Comment",
-		filters={"reference_doctype": "Payment Entry", "reference_name": pe_name, "content": AUTO_CREATED_COMMENT},
-		limit=1,
+	return bool(
+		frappe.db.exists(
+			"Comment",
+			{"reference_doctype": "Payment Entry", "reference_name": pe_name, "content": AUTO_CREATED_COMMENT},
+		)
 	)
-	return len(comments) > 0
 
 
 def _process_payment_receive(doc, customer: str, current_balance: float, payment_amount: float) -> None:
@@ -461,8 +444,8 @@ def _create_balance_ledger_entry(
 		remarks: Ledger entry remarks
 	"""
 	# Get phone and address
-	primary_address = frappe.db.get_value("Customer", customer, "customer_primary_address")
-	phone = frappe.db.get_value("Address", primary_address, "phone") if primary_address else None
+	primary_address = frappe.get_cached_value("Customer", customer, "customer_primary_address")
+	phone = frappe.get_cached_value("Address", primary_address, "phone") if primary_address else None
 
 	ledger = frappe.new_doc("Customer Balance Ledger")
 	ledger.transaction_date = doc.posting_date
@@ -502,15 +485,14 @@ def _update_so_for_credit_note_refunds(doc) -> None:
 
 		si_name = ref.reference_name
 
-		# Check if this is a Credit Note
-		is_credit_note = frappe.db.get_value("Sales Invoice", si_name, "is_return")
+		# Check if this is a Credit Note and get its original invoice in one query
+		is_credit_note, original_invoice = frappe.db.get_value(
+			"Sales Invoice", si_name, ["is_return", "return_against"]
+		) or (None, None)
 
 		if not is_credit_note:
 			continue
 
-		# Get original invoice
-		original_invoice = frappe.db.get_value("Sales Invoice", si_name, "return_against")
-
 		if not original_invoice:
 			continue
 
@@ -538,6 +520,41 @@ def _update_so_for_credit_note_refunds(doc) -> None:
 # ============================================================================
 
 
+def _update_sales_orders_from_references(doc) -> None:
+	"""Recalculate billing status of Sales Orders behind the PE's Sales Invoice references.
+
+	Args:
+		doc: Payment Entry document
+	"""
+	# Track updated Sales Orders (avoid duplicates)
+	updated_sales_orders = []
+
+	# Check all references in Payment Entry
+	for ref in doc.references:
+		if ref.reference_doctype != "Sales Invoice":
+			continue
+
+		si_name = ref.reference_name
+
+		# Get Sales Order linked to this Sales Invoice
+		so_name = _get_so_from_sales_invoice(si_name)
+
+		if so_name and so_name not in updated_sales_orders:
+			updated_sales_orders.append(so_name)
+
+			try:
+				# Recalculate and update SO billing status
+				update_result = _update_so_billing_status(so_name)
+
+				if update_result:
+					_show_so_update_message(so_name, update_result, "Payment")
+
+			except Exception as e:
+				frappe.log_error(
+					f"Failed to update SO billing status for {so_name}: {str(e)}", "PE SO Update Error"
+				)
+
+
 def _get_so_from_sales_invoice(si_name: str) -> Optional[str]:
 	"""Get Sales Order name from Sales Invoice.
 
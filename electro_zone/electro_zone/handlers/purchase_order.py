@@ -54,22 +54,33 @@ def validate_supplier_items(doc, method=None):
 	Raises:
 		frappe.ValidationError: If item doesn't belong to supplier
 	"""
+	# Fetch custom_primary_supplier for all items in one query instead of loading each Item
+	item_codes = list({item.item_code for item in doc.items if item.item_code})
+	if not item_codes:
+		return
+
+	primary_suppliers = dict(
+		frappe.db.get_all(
+			"Item",
+			filters={"name": ["in", item_codes]},
+			fields=["name", "custom_primary_supplier"],
+			as_list=True,
+		)
+	)
+
 	for item in doc.items:
-		if item.item_code:
-			# Get the item's custom_primary_supplier
-			item_doc = frappe.get_doc("Item", item.item_code)
+		if not item.item_code:
+			continue
 
-			# Use the get() method or check if field exists
-			custom_primary_supplier = item_doc.get("custom_primary_supplier")
+		custom_primary_supplier = primary_suppliers.get(item.item_code)
 
-			if custom_primary_supplier:
-				# Check if the item's custom_primary_supplier matches the PO supplier
-				if custom_primary_supplier != doc.supplier:
-					frappe.throw(
-						f"Item {item.item_code} is not linked to supplier {doc.supplier}. "
-						f"This item is linked to {custom_primary_supplier}. "
-						"Please select items that are linked to the selected supplier."
-					)
+		# Check if the item's custom_primary_supplier matches the PO supplier
+		if custom_primary_supplier and custom_primary_supplier != doc.supplier:
+			frappe.throw(
+				f"Item {item.item_code} is not linked to supplier {doc.supplier}. "
+				f"This item is linked to {custom_primary_supplier}. "
+				"Please select items that are linked to the selected supplier."
+			)
 
 
 def auto_sync_standard_buying_on_item_add(doc, method=None):
@@ -79,8 +90,8 @@ def auto_sync_standard_buying_on_item_add(doc, method=None):
 	Prevents stale data in Purchase Orders.
 
 	Workflow:
-	1. Loop through all items in Purchase Order
-	2. Check if Standard Buying Item Price exists
+	1. Collect unique item codes in Purchase Order
+	2. Check which have a Standard Buying Item Price (one query)
 	3. If missing but custom_repeat_final_rate_price > 0: Auto-create Item Price
 	4. Log action in PO comments for audit trail
 
@@ -93,60 +104,73 @@ def auto_sync_standard_buying_on_item_add(doc, method=None):
 	# Track items that were auto-synced for logging
 	auto_synced_items = []
 
-	# Loop through all items in the Purchase Order
-	for item in doc.items:
-		item_code = item.item_code
+	item_codes = list({item.item_code for item in doc.items if item.item_code})
+	if not item_codes:
+		return
 
-		if not item_code:
-			continue
+	# Find items without a Standard Buying Item Price in one query
+	priced_items = set(
+		frappe.db.get_all(
+			"Item Price",
+			filters={"item_code": ["in", item_codes], "price_list": "Standard Buying"},
+			pluck="item_code",
+		)
+	)
+	missing_price_items = [item_code for item_code in item_codes if item_code not in priced_items]
+	if not missing_price_items:
+		return
+
+	# Get Items' repeat final rate price in one query
+	item_data_map = {
+		row.name: row
+		for row in frappe.db.get_all(
+			"Item",
+			filters={"name": ["in", missing_price_items]},
+			fields=["name", "custom_repeat_final_rate_price", "custom_repeat_last_updated"],
+		)
+	}
 
-		# Check if Standard Buying Item Price exists
-		existing_price = frappe.db.exists("Item Price", {"item_code": item_code, "price_list": "Standard Buying"})
-
-		if not existing_price:
-			# Item Price doesn't exist - check if we can create it
-			try:
-				# Get Item's repeat final rate price
-				item_data = frappe.db.get_value(
-					"Item",
-					item_code,
-					["custom_repeat_final_rate_price", "custom_repeat_last_updated"],
-					as_dict=True,
-				)
-
-				if not item_data:
-					continue
-
-				final_rate_price = item_data.get("custom_repeat_final_rate_price")
-
-				# Only create if item has a valid repeat price
-				if final_rate_price and final_rate_price > 0:
-					# Create new Item Price record for Standard Buying
-					item_price = frappe.new_doc("Item Price")
-					item_price.item_code = item_code
-					item_price.price_list = "Standard Buying"
-					item_price.price_list_rate = final_rate_price
-
-					# Get currency from Global Defaults
-					currency = frappe.db.get_single_value("Global Defaults", "default_currency") or "EGP"
-					item_price.currency = currency
+	# Global Defaults currency, read once when the first Item Price is created
+	currency = None
 
-					# Set valid_from date
-					item_price.valid_from = item_data.get("custom_repeat_last_updated") or frappe.utils.now()
+	for item_code in missing_price_items:
+		# Item Price doesn't exist - check if we can create it
+		try:
+			item_data = item_data_map.get(item_code)
 
-					# Insert with permission bypass (system operation)
-					item_price.flags.ignore_permissions = True
-					item_price.insert()
+			if not item_data:
+				continue
 
-					# Track for logging
-					auto_synced_items.append(f"{item_code} ({final_rate_price})")
+			final_rate_price = item_data.get("custom_repeat_final_rate_price")
+
+			# Only create if item has a valid repeat price
+			if final_rate_price and final_rate_price > 0:
+				if currency is None:
+					currency = frappe.db.get_single_value("Global Defaults", "default_currency") or "EGP"
 
-			except Exception as e:
-				# Log error but don't block PO save
-				frappe.log_error(
-					f"Failed to auto-create Standard Buying price for {item_code}: {str(e)}",
-					"PO Auto-Sync Error",
-				)
+				# Create new Item Price record for Standard Buying
+				item_price = frappe.new_doc("Item Price")
+				item_price.item_code = item_code
+				item_price.price_list = "Standard Buying"
+				item_price.price_list_rate = final_rate_price
+				item_price.currency = currency
+
+				# Set valid_from date
+				item_price.valid_from = item_data.get("custom_repeat_last_updated") or frappe.utils.now()
+
+				# Insert with permission bypass (system operation)
+				item_price.flags.ignore_permissions = True
+				item_price.insert()
+
+				# Track for logging
+				auto_synced_items.append(f"{item_code} ({final_rate_price})")
+
+		except Exception as e:
+			# Log error but don't block PO save
+			frappe.log_error(
+				f"Failed to auto-create Standard Buying price for {item_code}: {str(e)}",
+				"PO Auto-Sync Error",
+			)
 
 	# Add comment to PO if items were auto-synced
 	if auto_synced_items:
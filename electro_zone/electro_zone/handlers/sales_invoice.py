@@ -46,13 +46,12 @@ def block_credit_note_if_dn_return_not_received(doc, method=None):
 			if item.get("delivery_note"):
 				dn_name = item.delivery_note
 
-				# Check if the DN is a return
-				dn_is_return = frappe.db.get_value("Delivery Note", dn_name, "is_return")
+				# Check if the DN is a return (and fetch its return status in the same query)
+				dn_is_return, dn_return_status = frappe.db.get_value(
+					"Delivery Note", dn_name, ["is_return", "custom_return_status"]
+				) or (None, None)
 
 				if dn_is_return == 1:
-					# Get the DN Return status
-					dn_return_status = frappe.db.get_value("Delivery Note", dn_name, "custom_return_status")
-
 					# Block if status is "Return Issued" (items still in transit)
 					if dn_return_status == "Return Issued":
 						frappe.throw(
@@ -111,10 +110,11 @@ def auto_allocate_balance(doc, method=None):
 				pe.company = doc.company
 
 				# Set accounts
-				pe.paid_from = frappe.db.get_value("Company", doc.company, "default_receivable_account")
-				pe.paid_to = frappe.db.get_value("Company", doc.company, "default_cash_account") or frappe.db.get_value(
-					"Company", doc.company, "default_bank_account"
+				receivable_account, cash_account, bank_account = frappe.get_cached_value(
+					"Company", doc.company, ["default_receivable_account", "default_cash_account", "default_bank_account"]
 				)
+				pe.paid_from = receivable_account
+				pe.paid_to = cash_account or bank_account
 
 				pe.paid_amount = allocate_amount
 				pe.received_amount = allocate_amount
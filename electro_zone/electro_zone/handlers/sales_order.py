@@ -3,23 +3,36 @@ Sales Order event handlers for electro_zone app
 """
 
 import frappe
-import frappe.utils
+from frappe.utils import flt, nowdate, nowtime, today
+
+from electro_zone.electro_zone.handlers.customer_balance_manager import (
+	get_available_balance,
+	release_reserved_balance,
+	reserve_balance_for_so,
+)
+from electro_zone.electro_zone.handlers.warehouse import get_hold_warehouse
+
+# Comment the marketplace order importer adds to the Sales Orders it creates
+MARKETPLACE_ORDER_MARKER = "AUTO_CREATED_FROM_MARKETPLACE_ORDER"
 
 
 def recalculate_amount(doc, method=None):
 	"""Recalculate item amounts based on qty, rate, and discount_value.
 
 	Server-side backup for amount calculation (Client Script may not fire in API calls).
-	Formula: amount = qty × (rate - discount_value)
+	Formula: amount = qty * (rate - discount_value)
 
 	Args:
 		doc: Sales Order document
 		method: Event method name (unused, required by Frappe hook signature)
 	"""
-	for item in doc.items:
-		discount_value = item.get("custom_discount_value") or 0
-		effective_rate = item.rate - discount_value
-		item.amount = item.qty * effective_rate
+	# Without discounts amount = qty * rate, which ERPNext already computes
+	items = doc.items
+	if not any(item.custom_discount_value for item in items):
+		return
+
+	for item in items:
+		item.amount = item.qty * (item.rate - (item.custom_discount_value or 0))
 
 
 def validate_discount(doc, method=None):
@@ -36,6 +49,15 @@ def validate_discount(doc, method=None):
 	Raises:
 		frappe.ValidationError: If discount validation fails
 	"""
+	# Fetch valuation rates for all items in one query instead of one per row
+	item_codes = list({item.item_code for item in doc.items if item.item_code})
+	valuation_rates = {}
+	if item_codes:
+		for row in frappe.db.get_all(
+			"Item", filters={"name": ["in", item_codes]}, fields=["name", "valuation_rate"]
+		):
+			valuation_rates[row.name] = flt(row.valuation_rate)
+
 	for item in doc.items:
 		discount_value = item.get("custom_discount_value") or 0
 
@@ -52,7 +74,7 @@ def validate_discount(doc, method=None):
 		# Ensures minimum margin is maintained
 		# Error message intentionally simple - does NOT reveal valuation_rate value
 		# Skip validation if valuation_rate is 0 or not set
-		valuation_rate = frappe.db.get_value("Item", item.item_code, "valuation_rate") or 0
+		valuation_rate = valuation_rates.get(item.item_code, 0)
 
 		if valuation_rate > 0:
 			effective_rate = item.rate - discount_value
@@ -73,12 +95,15 @@ def force_closed_if_returned(doc, method=None):
 		doc: Sales Order document (submitted)
 		method: Event method name (unused, required by Frappe hook signature)
 	"""
-	if doc.get("custom_is_returned", 0) == 1:
-		doc.status = "Closed"
-		frappe.log_error(
-			f"SO {doc.name} status forced to Closed (custom_is_returned=1)",
-			"Returned SO Status Protection",
-		)
+	# Skip non-returned orders and edits that leave an already Closed status alone
+	if doc.get("custom_is_returned", 0) != 1 or doc.status == "Closed":
+		return
+
+	doc.status = "Closed"
+	_log_info(
+		f"SO {doc.name} status forced to Closed (custom_is_returned=1)",
+		"Returned SO Status Protection",
+	)
 
 
 def validate_cancellation(doc, method=None):
@@ -95,91 +120,87 @@ def validate_cancellation(doc, method=None):
 	Raises:
 		frappe.ValidationError: If cancellation conditions are not met
 	"""
-	# Check for linked Sales Invoice Items
-	si_items = frappe.db.get_all(
-		"Sales Invoice Item", filters={"sales_order": doc.name}, fields=["parent"], limit=1
+	# Check for linked Sales Invoice (item link and invoice header in one query)
+	linked_invoices = frappe.db.sql(
+		"""
+		SELECT si.name, si.docstatus, si.posting_date, si.grand_total
+		FROM `tabSales Invoice` si
+		INNER JOIN `tabSales Invoice Item` sii ON sii.parent = si.name
+		WHERE sii.sales_order = %s
+		LIMIT 1
+	""",
+		(doc.name,),
+		as_dict=1,
 	)
 
-	if si_items:
-		si_name = si_items[0].parent
-		si_doc = frappe.db.get_value(
-			"Sales Invoice",
-			si_name,
-			["name", "docstatus", "posting_date", "grand_total"],
-			as_dict=True,
+	if linked_invoices:
+		si_doc = linked_invoices[0]
+		status_text = "Submitted" if si_doc.docstatus == 1 else "Cancelled" if si_doc.docstatus == 2 else "Draft"
+
+		frappe.throw(
+			"Cannot cancel Sales Order. A Sales Invoice is linked to this order:<br><br>"
+			f"• <b>{si_doc.name}</b> (Status: {status_text})<br><br>"
+			"<b>Why this is blocked:</b><br>"
+			"This Sales Order has a linked Sales Invoice. ERPNext's cascade cancellation "
+			"attempts to cancel all linked documents automatically, which causes:<br>"
+			"• Incorrect balance restoration order<br>"
+			"• Accounting inconsistencies<br>"
+			"• Stock return errors<br><br>"
+			"<b>Correct Process:</b><br>"
+			f"1. Manually cancel the Sales Invoice: <b>{si_doc.name}</b><br>"
+			"2. Wait for balance restoration to complete<br>"
+			"3. Then cancel this Sales Order<br><br>"
+			"<b>Note:</b> You MUST follow this sequence. There is no shortcut.",
+			title="Cancellation Blocked - Invoice Linked",
 		)
 
-		if si_doc:
-			status_text = "Submitted" if si_doc.docstatus == 1 else "Cancelled" if si_doc.docstatus == 2 else "Draft"
-
-			frappe.throw(
-				"Cannot cancel Sales Order. A Sales Invoice is linked to this order:<br><br>"
-				f"• <b>{si_doc.name}</b> (Status: {status_text})<br><br>"
-				"<b>Why this is blocked:</b><br>"
-				"This Sales Order has a linked Sales Invoice. ERPNext's cascade cancellation "
-				"attempts to cancel all linked documents automatically, which causes:<br>"
-				"• Incorrect balance restoration order<br>"
-				"• Accounting inconsistencies<br>"
-				"• Stock return errors<br><br>"
-				"<b>Correct Process:</b><br>"
-				f"1. Manually cancel the Sales Invoice: <b>{si_doc.name}</b><br>"
-				"2. Wait for balance restoration to complete<br>"
-				"3. Then cancel this Sales Order<br><br>"
-				"<b>Note:</b> You MUST follow this sequence. There is no shortcut.",
-				title="Cancellation Blocked - Invoice Linked",
-			)
-
-	# Check Delivery Note workflow states
-	dn_items = frappe.db.get_all(
-		"Delivery Note Item",
-		filters={"against_sales_order": doc.name},
-		fields=["parent"],
-		distinct=True,
+	# Check Delivery Note workflow states (item link and DN header in one query)
+	all_dns = frappe.db.sql(
+		"""
+		SELECT DISTINCT dn.name, dn.docstatus, dn.workflow_state, dn.posting_date, dn.grand_total
+		FROM `tabDelivery Note` dn
+		INNER JOIN `tabDelivery Note Item` dni ON dni.parent = dn.name
+		WHERE dni.against_sales_order = %s
+	""",
+		(doc.name,),
+		as_dict=1,
 	)
 
-	if dn_items:
-		dn_names = [item.parent for item in dn_items]
-		all_dns = frappe.db.get_all(
-			"Delivery Note",
-			filters={"name": ["in", dn_names]},
-			fields=["name", "docstatus", "workflow_state", "posting_date", "grand_total"],
-		)
-
-		for dn in all_dns:
-			dn_workflow_state = dn.get("workflow_state", "")
-			dn_docstatus = dn.get("docstatus", 0)
+	for dn in all_dns:
+		dn_workflow_state = dn.get("workflow_state", "")
+		dn_docstatus = dn.get("docstatus", 0)
 
-			# STRICT RULE: ONLY allow cancellation if workflow_state is "Pending Dispatch"
-			if dn_workflow_state != "Pending Dispatch":
-				if dn_docstatus == 2:
-					status_display = "Cancelled"
-				elif dn_docstatus == 1:
-					status_display = dn_workflow_state or "Submitted"
-				else:
-					status_display = dn_workflow_state or "Draft"
+		# STRICT RULE: ONLY allow cancellation if workflow_state is "Pending Dispatch"
+		if dn_workflow_state != "Pending Dispatch":
+			if dn_docstatus == 2:
+				status_display = "Cancelled"
+			elif dn_docstatus == 1:
+				status_display = dn_workflow_state or "Submitted"
+			else:
+				status_display = dn_workflow_state or "Draft"
 
-				frappe.throw(
-					"Cannot cancel Sales Order. Delivery Note must be in <b>Pending Dispatch</b> status.<br><br>"
-					f"• Delivery Note: <b>{dn.name}</b><br>"
-					f"• Current Status: <b>{status_display}</b><br>"
-					f"• docstatus: {dn_docstatus}<br><br>"
-					"<b>Why this is blocked:</b><br>"
-					"Sales Orders can ONLY be cancelled if the Delivery Note is in <b>Pending Dispatch</b> status.<br><br>"
-					f"<b>Current workflow_state: '{dn_workflow_state or '(empty)'}'</b><br><br>"
-					"<b>Options:</b><br>"
-					"1. If DN is submitted: Cancel the Delivery Note first, then cancel this Sales Order<br>"
-					"2. If DN is in wrong state: Contact administrator<br><br>"
-					"<b>Allowed:</b> workflow_state = 'Pending Dispatch' only",
-					title="Cancellation Blocked - DN Not in Pending Dispatch",
-				)
+			frappe.throw(
+				"Cannot cancel Sales Order. Delivery Note must be in <b>Pending Dispatch</b> status.<br><br>"
+				f"• Delivery Note: <b>{dn.name}</b><br>"
+				f"• Current Status: <b>{status_display}</b><br>"
+				f"• docstatus: {dn_docstatus}<br><br>"
+				"<b>Why this is blocked:</b><br>"
+				"Sales Orders can ONLY be cancelled if the Delivery Note is in <b>Pending Dispatch</b> status.<br><br>"
+				f"<b>Current workflow_state: '{dn_workflow_state or '(empty)'}'</b><br><br>"
+				"<b>Options:</b><br>"
+				"1. If DN is submitted: Cancel the Delivery Note first, then cancel this Sales Order<br>"
+				"2. If DN is in wrong state: Contact administrator<br><br>"
+				"<b>Allowed:</b> workflow_state = 'Pending Dispatch' only",
+				title="Cancellation Blocked - DN Not in Pending Dispatch",
+			)
 
 
 def move_to_hold(doc, method=None):
 	"""Move stock to Hold warehouse.
 
 	Workflow:
-	1. Capture source warehouse for later stock return
-	2. Skip if auto-created or Pending Review
+	1. Skip if auto-created or Pending Review
+	2. Single pass over items: capture source warehouse, build Stock Entry rows
 	3. Create Stock Entry to transfer stock to Hold warehouse
 	4. Update Sales Order items to use Hold warehouse
 
@@ -187,109 +208,108 @@ def move_to_hold(doc, method=None):
 		doc: Sales Order document
 		method: Event method name (unused, required by Frappe hook signature)
 	"""
-	# STEP 1: Capture source warehouse before modifications
-	source_warehouse = None
-	for so_item in doc.items:
-		if so_item.warehouse:
-			source_warehouse = so_item.warehouse
-			break
+	# STEP 1: Check skip conditions
+	skip_conditions = doc.status == "Pending Review" or _is_marketplace_order(doc)
 
-	if source_warehouse:
-		frappe.db.set_value(
-			"Sales Order", doc.name, "custom_source_warehouse", source_warehouse, update_modified=False
-		)
-
-	# STEP 2: Check skip conditions
-	comments = frappe.get_all(
-		"Comment",
-		filters={
-			"reference_doctype": "Sales Order",
-			"reference_name": doc.name,
-			"content": "AUTO_CREATED_FROM_MARKETPLACE_ORDER",
-		},
-		limit=1,
-	)
-
-	is_auto_created = len(comments) > 0
-	skip_conditions = is_auto_created or doc.status == "Pending Review"
+	hold_warehouse = None
+	if not skip_conditions:
+		hold_warehouse = get_hold_warehouse(doc.company)
 
-	if skip_conditions:
-		frappe.msgprint(
-			"Auto-created or Pending Review Sales Order. Skipping Hold movement on this submission.",
-			indicator="orange",
-			title="Skipped",
-		)
-		return
+		if not hold_warehouse:
+			frappe.throw(f"Hold warehouse not found for company {doc.company}. Please create it first.")
 
-	# STEP 3: Move stock to Hold warehouse
-	hold_warehouse = frappe.db.get_value(
-		"Warehouse",
-		{"warehouse_name": ["like", "%Hold%"], "company": doc.company, "is_group": 0},
-		"name",
-	)
+	# STEP 2: Capture source warehouse and build Stock Entry rows in one pass
+	source_warehouse = None
+	stock_entry_rows = []
 
-	if not hold_warehouse:
-		frappe.throw(f"Hold warehouse not found for company {doc.company}. Please create it first.")
+	bin_qty = {}
+	stock_uoms = {}
+	if not skip_conditions:
+		item_codes = {so_item.item_code for so_item in doc.items if so_item.item_code}
+		bin_qty = _get_bin_qty_map(item_codes, {so_item.warehouse for so_item in doc.items if so_item.warehouse})
+		stock_uoms = _get_stock_uom_map(item_codes)
 
-	# Create Stock Entry (Material Transfer)
-	stock_entry = frappe.new_doc("Stock Entry")
-	stock_entry.stock_entry_type = "Material Transfer"
-	stock_entry.company = doc.company
-	stock_entry.posting_date = doc.transaction_date
-	stock_entry.posting_time = frappe.utils.nowtime()
-	stock_entry.set_posting_time = 1
+	for so_item in doc.items:
+		if so_item.warehouse and not source_warehouse:
+			source_warehouse = so_item.warehouse
 
-	items_added = False
+		if skip_conditions:
+			if source_warehouse:
+				break
+			continue
 
-	for so_item in doc.items:
-		if not so_item.warehouse or frappe.utils.flt(so_item.qty) <= 0:
+		if not so_item.warehouse or so_item.warehouse == hold_warehouse:
 			continue
 
-		if so_item.warehouse == hold_warehouse:
+		qty = flt(so_item.qty)
+		if qty <= 0:
 			continue
 
-		available_qty = frappe.utils.flt(
-			frappe.db.get_value(
-				"Bin", {"item_code": so_item.item_code, "warehouse": so_item.warehouse}, "actual_qty"
-			)
-			or 0
-		)
+		available_qty = bin_qty.get((so_item.item_code, so_item.warehouse), 0)
 
-		if available_qty < frappe.utils.flt(so_item.qty):
+		if available_qty < qty:
 			frappe.throw(
 				f"Insufficient stock for <b>{so_item.item_code}</b> in <b>{so_item.warehouse}</b>. "
 				f"Available: <b>{available_qty}</b>, Required: <b>{so_item.qty}</b>"
 			)
 
-		stock_uom = frappe.db.get_value("Item", so_item.item_code, "stock_uom")
+		stock_uom = stock_uoms.get(so_item.item_code)
+		conversion_factor = flt(so_item.conversion_factor) or 1.0
 
-		stock_entry.append(
-			"items",
+		stock_entry_rows.append(
 			{
 				"item_code": so_item.item_code,
-				"qty": frappe.utils.flt(so_item.qty),
+				"qty": qty,
 				"s_warehouse": so_item.warehouse,
 				"t_warehouse": hold_warehouse,
 				"uom": so_item.uom or stock_uom,
 				"stock_uom": stock_uom,
-				"conversion_factor": frappe.utils.flt(so_item.conversion_factor) or 1.0,
-				"transfer_qty": frappe.utils.flt(so_item.qty) * (frappe.utils.flt(so_item.conversion_factor) or 1.0),
+				"conversion_factor": conversion_factor,
+				"transfer_qty": qty * conversion_factor,
 				"sales_order": doc.name,
-			},
+			}
+		)
+
+	if source_warehouse:
+		frappe.db.set_value(
+			"Sales Order", doc.name, "custom_source_warehouse", source_warehouse, update_modified=False
 		)
-		items_added = True
 
-	if not items_added:
+	if skip_conditions:
+		frappe.msgprint(
+			"Auto-created or Pending Review Sales Order. Skipping Hold movement on this submission.",
+			indicator="orange",
+			title="Skipped",
+		)
+		return
+
+	if not stock_entry_rows:
 		frappe.msgprint("No items to transfer to Hold warehouse.", indicator="orange", title="No Transfer")
 		return
 
+	# STEP 3: Create Stock Entry (Material Transfer)
+	stock_entry = frappe.new_doc("Stock Entry")
+	stock_entry.stock_entry_type = "Material Transfer"
+	stock_entry.company = doc.company
+	stock_entry.posting_date = doc.transaction_date
+	stock_entry.posting_time = nowtime()
+	stock_entry.set_posting_time = 1
+	stock_entry.set("items", stock_entry_rows)
 	stock_entry.insert(ignore_permissions=True)
 	stock_entry.submit()
 
-	# Update Sales Order items to use Hold warehouse
-	for so_item in doc.items:
-		if so_item.warehouse and so_item.warehouse != hold_warehouse:
-			frappe.db.set_value("Sales Order Item", so_item.name, "warehouse", hold_warehouse, update_modified=False)
+	# STEP 4: Update Sales Order items to use Hold warehouse (single UPDATE for all rows)
+	frappe.db.sql(
+		"""
+		UPDATE `tabSales Order Item`
+		SET warehouse = %s
+		WHERE parent = %s
+			AND warehouse IS NOT NULL
+			AND warehouse != ''
+			AND warehouse != %s
+	""",
+		(hold_warehouse, doc.name, hold_warehouse),
+	)
 
 	doc.add_comment(
 		"Comment", f'Stock moved to Hold via Stock Entry <a href="/app/stock-entry/{stock_entry.name}">{stock_entry.name}</a>'
@@ -303,6 +323,21 @@ def move_to_hold(doc, method=None):
 	)
 
 
+def flag_marketplace_sales_order(doc, method=None):
+	"""Set custom_auto_created_from_marketplace when the importer's marker comment is added.
+
+	Args:
+		doc: Comment document
+		method: Event method name (unused, required by Frappe hook signature)
+	"""
+	if doc.reference_doctype != "Sales Order" or doc.content != MARKETPLACE_ORDER_MARKER:
+		return
+
+	frappe.db.set_value(
+		"Sales Order", doc.reference_name, "custom_auto_created_from_marketplace", 1, update_modified=False
+	)
+
+
 def deduct_balance(doc, method=None):
 	"""Reserve balance from custom_current_balance for Sales Order.
 
@@ -310,8 +345,6 @@ def deduct_balance(doc, method=None):
 		doc: Sales Order document
 		method: Event method name (unused, required by Frappe hook signature)
 	"""
-	from .customer_balance_manager import reserve_balance_for_so, get_available_balance
-
 	customer = doc.customer
 	so_total = doc.grand_total
 
@@ -359,8 +392,6 @@ def cancel_and_return_stock(doc, method=None):
 		doc: Sales Order document
 		method: Event method name (unused, required by Frappe hook signature)
 	"""
-	from .customer_balance_manager import release_reserved_balance
-
 	# STEP 1: Release reserved balance FIRST
 	try:
 		result = release_reserved_balance(doc.customer, doc.name)
@@ -374,60 +405,70 @@ def cancel_and_return_stock(doc, method=None):
 		frappe.log_error(f"Failed to release reserved balance for SO {doc.name}: {str(e)}", "Balance Release Error")
 		frappe.msgprint(f"Warning: Failed to release reserved balance: {str(e)}", indicator="orange")
 
-	# STEP 2: Auto-cancel draft Delivery Notes linked to this SO
-	dn_items = frappe.db.get_all(
-		"Delivery Note Item", filters={"against_sales_order": doc.name}, fields=["parent"], distinct=True
+	# STEP 2: Auto-cancel Pending Dispatch Delivery Notes linked to this SO
+	# validate_cancellation (before_cancel) already blocks cancellation when any linked DN
+	# is in another state, so only Pending Dispatch DNs need to be fetched here
+	pending_dns = frappe.db.sql(
+		"""
+		SELECT DISTINCT dn.name
+		FROM `tabDelivery Note` dn
+		INNER JOIN `tabDelivery Note Item` dni ON dni.parent = dn.name
+		WHERE dni.against_sales_order = %s
+			AND dn.workflow_state = 'Pending Dispatch'
+	""",
+		(doc.name,),
+		as_dict=1,
 	)
 
-	if dn_items:
-		dn_names = list(set([item.parent for item in dn_items]))
-
-		for dn_name in dn_names:
-			try:
-				dn_doc = frappe.get_doc("Delivery Note", dn_name)
-				dn_workflow_state = dn_doc.get("workflow_state", "")
-
-				# Only cancel DNs in Pending Dispatch state
-				if dn_workflow_state == "Pending Dispatch":
-					frappe.db.set_value(
-						"Delivery Note", dn_name, {"docstatus": 2, "workflow_state": "Cancelled"}, update_modified=False
-					)
+	dn_names = [dn.name for dn in pending_dns]
+
+	if dn_names:
+		try:
+			frappe.db.sql(
+				"""
+				UPDATE `tabDelivery Note`
+				SET docstatus = 2, workflow_state = 'Cancelled'
+				WHERE name IN %s AND workflow_state = 'Pending Dispatch'
+			""",
+				(tuple(dn_names),),
+			)
 
-					dn_doc.add_comment("Comment", f"Auto-cancelled because linked Sales Order {doc.name} was cancelled")
+			# Insert through the Comment doctype so after_insert fills comment_by and the DN's _comments
+			for dn_name in dn_names:
+				frappe.get_doc(
+					{
+						"doctype": "Comment",
+						"comment_type": "Comment",
+						"reference_doctype": "Delivery Note",
+						"reference_name": dn_name,
+						"content": f"Auto-cancelled because linked Sales Order {doc.name} was cancelled",
+					}
+				).insert(ignore_permissions=True)
 
-					frappe.msgprint(
-						f"Cancelled Delivery Note: <b>{dn_name}</b> (was in Pending Dispatch status)",
-						indicator="blue",
-						title="DN Cancelled",
-					)
+			frappe.msgprint(
+				"Cancelled Delivery Notes (were in Pending Dispatch status):<br>"
+				+ "<br>".join(f"<b>{dn_name}</b>" for dn_name in dn_names),
+				indicator="blue",
+				title="DN Cancelled",
+			)
 
-					frappe.log_error(
-						f"Cancelled DN {dn_name} (Pending Dispatch) linked to cancelled SO {doc.name}",
-						"Auto-Cancel DN - Pending Dispatch",
-					)
-				else:
-					frappe.msgprint(
-						f"Skipped DN <b>{dn_name}</b> - not in Pending Dispatch (workflow_state: {dn_workflow_state or '(empty)'})",
-						indicator="orange",
-						title="DN Not Cancelled",
-					)
+			_log_info(
+				f"Cancelled DNs (Pending Dispatch) linked to cancelled SO {doc.name}:\n" + "\n".join(dn_names),
+				"Auto-Cancel DN - Pending Dispatch",
+			)
 
-			except Exception as e:
-				frappe.log_error(
-					f"Failed to cancel DN {dn_name} for SO {doc.name}: {str(e)}", "DN Cancellation Error"
-				)
-				frappe.msgprint(
-					f"Failed to cancel Delivery Note <b>{dn_name}</b>: {str(e)}",
-					indicator="orange",
-					title="DN Cancellation Failed",
-				)
+		except Exception as e:
+			frappe.log_error(
+				f"Failed to cancel DNs {', '.join(dn_names)} for SO {doc.name}: {str(e)}", "DN Cancellation Error"
+			)
+			frappe.msgprint(
+				f"Failed to cancel Delivery Notes <b>{', '.join(dn_names)}</b>: {str(e)}",
+				indicator="orange",
+				title="DN Cancellation Failed",
+			)
 
 	# Stock return logic
-	hold_warehouse = frappe.db.get_value(
-		"Warehouse",
-		{"warehouse_name": ["like", "%Hold%"], "company": doc.company, "is_group": 0},
-		"name",
-	)
+	hold_warehouse = get_hold_warehouse(doc.company)
 
 	if not hold_warehouse:
 		frappe.msgprint("Hold warehouse not found. Stock return skipped.", indicator="yellow", title="No Hold Warehouse")
@@ -445,48 +486,56 @@ def cancel_and_return_stock(doc, method=None):
 			stock_entry = frappe.new_doc("Stock Entry")
 			stock_entry.stock_entry_type = "Material Transfer"
 			stock_entry.company = doc.company
-			stock_entry.posting_date = frappe.utils.nowdate()
-			stock_entry.posting_time = frappe.utils.nowtime()
+			stock_entry.posting_date = nowdate()
+			stock_entry.posting_time = nowtime()
 			stock_entry.set_posting_time = 1
 
-			items_added = False
+			stock_entry_rows = []
+			insufficient_stock = []
+
+			item_codes = {so_item.item_code for so_item in doc.items if so_item.item_code}
+			bin_qty = _get_bin_qty_map(item_codes, {hold_warehouse})
+			stock_uoms = _get_stock_uom_map(item_codes)
 
 			for so_item in doc.items:
-				if not so_item.item_code or frappe.utils.flt(so_item.qty) <= 0:
+				qty = flt(so_item.qty)
+				if not so_item.item_code or qty <= 0:
 					continue
 
-				available_qty = frappe.utils.flt(
-					frappe.db.get_value("Bin", {"item_code": so_item.item_code, "warehouse": hold_warehouse}, "actual_qty") or 0
-				)
+				available_qty = bin_qty.get((so_item.item_code, hold_warehouse), 0)
 
-				if available_qty < frappe.utils.flt(so_item.qty):
-					frappe.msgprint(
-						f"Insufficient stock in Hold for <b>{so_item.item_code}</b>. "
-						f"Available: {available_qty}, Required: {so_item.qty}. Item skipped.",
-						indicator="orange",
-						title="Insufficient Stock",
+				if available_qty < qty:
+					insufficient_stock.append(
+						f"<b>{so_item.item_code}</b>: Available: {available_qty}, Required: {so_item.qty}"
 					)
 					continue
 
-				stock_uom = frappe.db.get_value("Item", so_item.item_code, "stock_uom")
+				stock_uom = stock_uoms.get(so_item.item_code)
+				conversion_factor = flt(so_item.conversion_factor) or 1.0
 
-				stock_entry.append(
-					"items",
+				stock_entry_rows.append(
 					{
 						"item_code": so_item.item_code,
-						"qty": frappe.utils.flt(so_item.qty),
+						"qty": qty,
 						"s_warehouse": hold_warehouse,
 						"t_warehouse": target_warehouse,
 						"uom": so_item.uom or stock_uom,
 						"stock_uom": stock_uom,
-						"conversion_factor": frappe.utils.flt(so_item.conversion_factor) or 1.0,
-						"transfer_qty": frappe.utils.flt(so_item.qty) * (frappe.utils.flt(so_item.conversion_factor) or 1.0),
-					},
+						"conversion_factor": conversion_factor,
+						"transfer_qty": qty * conversion_factor,
+					}
+				)
+
+			if insufficient_stock:
+				frappe.msgprint(
+					"Insufficient stock in Hold. These items were skipped:<br>" + "<br>".join(insufficient_stock),
+					indicator="orange",
+					title="Insufficient Stock",
 				)
-				items_added = True
 
-			if items_added:
+			if stock_entry_rows:
 				try:
+					stock_entry.set("items", stock_entry_rows)
 					stock_entry.insert(ignore_permissions=True)
 					stock_entry.submit()
 
@@ -522,12 +571,13 @@ def cancel_and_return_stock(doc, method=None):
 	# Create reference-only ledger entry for cancellation
 	so_total = doc.grand_total
 	customer = doc.customer
-	current_balance = frappe.db.get_value("Customer", customer, "custom_current_balance") or 0.0
+	# Lock the customer row so the ledger snapshot cannot interleave with a concurrent balance write
+	current_balance = frappe.db.get_value("Customer", customer, "custom_current_balance", for_update=True) or 0.0
 
 	# Create REFERENCE-ONLY ledger entry
 	ledger = frappe.new_doc("Customer Balance Ledger")
-	ledger.transaction_date = frappe.utils.today()
-	ledger.posting_time = frappe.utils.nowtime()
+	ledger.transaction_date = today()
+	ledger.posting_time = nowtime()
 	ledger.customer = customer
 	ledger.customer_name = doc.customer_name
 	ledger.reference_doctype = "Sales Order"
@@ -549,3 +599,107 @@ def cancel_and_return_stock(doc, method=None):
 		indicator="blue",
 		title="SO Cancelled",
 	)
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+
+def _log_info(message, title):
+	"""Record an informational event in the electro_zone file log (no DB write).
+
+	Set electro_zone_info_to_error_log in site_config.json to also write these
+	events to Error Log while diagnosing; those entries are enqueued on the short
+	queue after commit, so rolled-back events are not logged.
+	Use frappe.log_error directly for real failures.
+
+	Args:
+		message: Log message
+		title: Event title
+	"""
+	frappe.logger("electro_zone").info(f"{title}: {message}")
+
+	if frappe.conf.get("electro_zone_info_to_error_log"):
+		frappe.enqueue(
+			"frappe.log_error",
+			queue="short",
+			enqueue_after_commit=True,
+			title=title,
+			message=message,
+		)
+
+
+def _is_marketplace_order(doc):
+	"""Check whether a Sales Order was created by the marketplace order importer.
+
+	The importer should set custom_auto_created_from_marketplace before inserting the
+	SO. When the flag is only written to the database by flag_marketplace_sales_order
+	(marker comment added after insert), an in-memory SO that is then submitted still
+	holds 0 and db_update overwrites the stored 1. The copy Frappe loaded by primary key
+	before this save (get_doc_before_save) still has it, so the flag is read from there
+	and written back.
+
+	Args:
+		doc: Sales Order document
+
+	Returns:
+		bool: True if the SO is marketplace-created
+	"""
+	if doc.get("custom_auto_created_from_marketplace"):
+		return True
+
+	doc_before_save = doc.get_doc_before_save()
+	if not (doc_before_save and doc_before_save.get("custom_auto_created_from_marketplace")):
+		return False
+
+	doc.custom_auto_created_from_marketplace = 1
+	frappe.db.set_value(
+		"Sales Order", doc.name, "custom_auto_created_from_marketplace", 1, update_modified=False
+	)
+	return True
+
+
+def _get_bin_qty_map(item_codes, warehouses):
+	"""Fetch Bin actual_qty for all item/warehouse combinations in one query.
+
+	Args:
+		item_codes: Set of item codes to fetch
+		warehouses: Set of warehouse names to fetch
+
+	Returns:
+		dict: {(item_code, warehouse): actual_qty}, missing Bins are absent
+	"""
+	if not item_codes or not warehouses:
+		return {}
+
+	bins = frappe.db.sql(
+		"""
+		SELECT item_code, warehouse, actual_qty
+		FROM `tabBin`
+		WHERE item_code IN %(item_codes)s AND warehouse IN %(warehouses)s
+	""",
+		{"item_codes": tuple(item_codes), "warehouses": tuple(warehouses)},
+		as_dict=1,
+	)
+
+	return {(row.item_code, row.warehouse): flt(row.actual_qty) for row in bins}
+
+
+def _get_stock_uom_map(item_codes):
+	"""Fetch Item.stock_uom for all item codes in one query.
+
+	Args:
+		item_codes: Set of item codes to fetch
+
+	Returns:
+		dict: {item_code: stock_uom}
+	"""
+	if not item_codes:
+		return {}
+
+	return dict(
+		frappe.db.get_all(
+			"Item", filters={"name": ["in", list(item_codes)]}, fields=["name", "stock_uom"], as_list=True
+		)
+	)
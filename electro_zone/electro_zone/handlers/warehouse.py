@@ -0,0 +1,60 @@
+"""
+Warehouse event handlers and lookups for electro_zone app
+"""
+
+import frappe
+
+# Redis hash: company -> Hold warehouse name
+HOLD_WAREHOUSE_CACHE_KEY = "electro_zone_hold_warehouse"
+
+
+def get_hold_warehouse(company):
+	"""Get the Hold (reserved stock) warehouse for a company.
+
+	Uses Company.custom_hold_warehouse when set. Falls back to the first non-group
+	warehouse with "Hold" in its name (a LIKE scan, so setting the field is preferred).
+
+	Cached per company in Redis; the cache is cleared by clear_hold_warehouse_cache
+	whenever a Warehouse or Company is saved, renamed or deleted.
+
+	Args:
+		company: Company name
+
+	Returns:
+		str: Hold warehouse name, or None if the company has none
+	"""
+	hold_warehouse = frappe.cache().hget(HOLD_WAREHOUSE_CACHE_KEY, company)
+	if hold_warehouse:
+		return hold_warehouse
+
+	hold_warehouse = frappe.db.get_value("Company", company, "custom_hold_warehouse")
+
+	if not hold_warehouse:
+		hold_warehouse = frappe.db.get_value(
+			"Warehouse",
+			{"warehouse_name": ["like", "%Hold%"], "company": company, "is_group": 0},
+			"name",
+		)
+
+	# Don't cache misses, so a newly created Hold warehouse is picked up immediately
+	if hold_warehouse:
+		frappe.cache().hset(HOLD_WAREHOUSE_CACHE_KEY, company, hold_warehouse)
+
+	return hold_warehouse
+
+
+# ============================================================================
+# EVENT HANDLERS
+# ============================================================================
+
+
+def clear_hold_warehouse_cache(doc, method=None):
+	"""Invalidate the cached Hold warehouse lookups.
+
+	Event: On Update, After Rename, On Trash (Warehouse and Company)
+
+	Args:
+		doc: Warehouse or Company document
+		method: Event method name (unused, required by Frappe hook signature)
+	"""
+	frappe.cache().delete_key(HOLD_WAREHOUSE_CACHE_KEY)
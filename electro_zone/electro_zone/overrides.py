@@ -0,0 +1,85 @@
+"""
+Controller overrides for electro_zone app
+
+Sales Order and Delivery Note carry most of the app's document event handlers. Instead
+of registering each one in doc_events, these subclasses are wired in through
+override_doctype_class and call the handlers as plain methods. Every override runs the
+ERPNext controller method first and the handlers after it, which is the same order
+Frappe used for doc_events.
+"""
+
+from erpnext.selling.doctype.sales_order.sales_order import SalesOrder
+from erpnext.stock.doctype.delivery_note.delivery_note import DeliveryNote
+
+from electro_zone.electro_zone.handlers import delivery_note as dn_handlers
+from electro_zone.electro_zone.handlers import sales_order as so_handlers
+from electro_zone.electro_zone.utils import prefetch_singles
+
+
+def _run_parent(doc, parent_cls, method):
+	"""Run the ERPNext controller method if the parent class defines it.
+
+	Args:
+		doc: Document being processed
+		parent_cls: Class whose MRO is searched after the override
+		method: Controller method name (e.g. "before_cancel")
+	"""
+	fn = getattr(super(parent_cls, doc), method, None)
+	if fn:
+		fn()
+
+
+class ElectroZoneSalesOrder(SalesOrder):
+	def before_insert(self):
+		_run_parent(self, ElectroZoneSalesOrder, "before_insert")
+		so_handlers.recalculate_amount(self, "before_insert")
+
+	def before_validate(self):
+		_run_parent(self, ElectroZoneSalesOrder, "before_validate")
+		prefetch_singles(self, "before_validate")
+
+	def validate(self):
+		super().validate()
+		so_handlers.validate_discount(self, "validate")
+
+	def before_update_after_submit(self):
+		_run_parent(self, ElectroZoneSalesOrder, "before_update_after_submit")
+		so_handlers.force_closed_if_returned(self, "before_update_after_submit")
+
+	def before_cancel(self):
+		_run_parent(self, ElectroZoneSalesOrder, "before_cancel")
+		so_handlers.validate_cancellation(self, "before_cancel")
+
+	def on_submit(self):
+		super().on_submit()
+		so_handlers.move_to_hold(self, "on_submit")
+		so_handlers.deduct_balance(self, "on_submit")
+
+	def on_cancel(self):
+		super().on_cancel()
+		so_handlers.cancel_and_return_stock(self, "on_cancel")
+
+
+class ElectroZoneDeliveryNote(DeliveryNote):
+	def before_validate(self):
+		_run_parent(self, ElectroZoneDeliveryNote, "before_validate")
+		prefetch_singles(self, "before_validate")
+
+	def before_submit(self):
+		_run_parent(self, ElectroZoneDeliveryNote, "before_submit")
+		dn_handlers.validate_sales_order_reference(self, "before_submit")
+
+	def before_cancel(self):
+		_run_parent(self, ElectroZoneDeliveryNote, "before_cancel")
+		dn_handlers.block_cancel_if_delivered(self, "before_cancel")
+
+	def on_submit(self):
+		super().on_submit()
+		dn_handlers.update_item_stock_fields(self, "on_submit")
+		dn_handlers.create_reference_ledger_entry(self, "on_submit")
+		dn_handlers.auto_invoice_on_out_for_delivery(self, "on_submit")
+		dn_handlers.auto_return_stock_on_delivery_failed(self, "on_submit")
+
+	def on_cancel(self):
+		super().on_cancel()
+		dn_handlers.auto_close_so_on_cancel(self, "on_cancel")
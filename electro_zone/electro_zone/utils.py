@@ -0,0 +1,59 @@
+"""
+Settings prefetch hook for electro_zone app
+"""
+
+import frappe
+from frappe.utils.data import cast
+
+# Single doctypes read by electro_zone handlers and by ERPNext validation of the
+# documents they hook into
+PREFETCH_SINGLES = (
+	"Global Defaults",
+	"Stock Settings",
+	"Accounts Settings",
+	"Selling Settings",
+	"Buying Settings",
+)
+
+
+def prefetch_singles(doc=None, method=None):
+	"""Seed the request's single-value cache for PREFETCH_SINGLES with one query.
+
+	frappe.db.get_single_value caches per (doctype, fieldname) in frappe.db.value_cache,
+	but fills it one SELECT at a time. Loading all rows of the common settings
+	doctypes up front turns those into dict lookups. Values are cast like
+	get_single_value does, and entries already cached are left untouched. The cache
+	lives on the request's DB connection, so nothing needs clearing afterwards.
+
+	Registered as before_validate on the transactions whose ERPNext validation reads
+	these settings, so requests that never validate one skip the query. Runs at most
+	once per request or job.
+
+	Args:
+		doc: Document being validated (unused)
+		method: Event method name (unused, required by Frappe hook signature)
+	"""
+	if getattr(frappe.local, "ez_singles_prefetched", False):
+		return
+	frappe.local.ez_singles_prefetched = True
+
+	value_cache = getattr(frappe.db, "value_cache", None)
+	if value_cache is None:
+		return
+
+	rows = frappe.db.sql(
+		"""
+		SELECT doctype, field, value
+		FROM `tabSingles`
+		WHERE doctype IN %s
+	""",
+		(PREFETCH_SINGLES,),
+		as_dict=1,
+	)
+
+	for row in rows:
+		df = frappe.get_meta(row.doctype).get_field(row.field)
+		if not df:
+			continue
+
+		value_cache.setdefault(row.doctype, {}).setdefault(row.field, cast(df.fieldtype, row.value))
@@ -143,9 +143,10 @@ doctype_list_js = {
 # ---------------
 # Override standard doctype classes
 
-# override_doctype_class = {
-# 	"ToDo": "custom_app.overrides.CustomToDo"
-# }
+override_doctype_class = {
+	"Sales Order": "electro_zone.electro_zone.overrides.ElectroZoneSalesOrder",
+	"Delivery Note": "electro_zone.electro_zone.overrides.ElectroZoneDeliveryNote",
+}
 
 # Document Events
 # ---------------
@@ -165,40 +166,12 @@ doc_events = {
 		"before_update_after_submit": "electro_zone.electro_zone.handlers.item.auto_assign_supplier_from_brand",
 	},
 	"Purchase Order": {
-		"validate": [
-			"electro_zone.electro_zone.handlers.purchase_order.validate_supplier_items",
-			"electro_zone.electro_zone.handlers.purchase_order.auto_sync_standard_buying_on_item_add",
-			"electro_zone.electro_zone.handlers.purchase_order.sync_price_edit_status",
-		]
-	},
-	"Sales Order": {
-		"before_insert": "electro_zone.electro_zone.handlers.sales_order.recalculate_amount",
-		"validate": "electro_zone.electro_zone.handlers.sales_order.validate_discount",
-		"before_update_after_submit": "electro_zone.electro_zone.handlers.sales_order.force_closed_if_returned",
-		"before_cancel": "electro_zone.electro_zone.handlers.sales_order.validate_cancellation",
-		"on_submit": [
-			"electro_zone.electro_zone.handlers.sales_order.move_to_hold",
-			"electro_zone.electro_zone.handlers.sales_order.deduct_balance"
-		],
-		"on_cancel": "electro_zone.electro_zone.handlers.sales_order.cancel_and_return_stock"
-	},
-	"Delivery Note": {
-		"before_submit": "electro_zone.electro_zone.handlers.delivery_note.validate_sales_order_reference",
-		"before_cancel": "electro_zone.electro_zone.handlers.delivery_note.block_cancel_if_delivered",
-		"on_submit": [
-			"electro_zone.electro_zone.handlers.delivery_note.update_item_stock_fields",
-			"electro_zone.electro_zone.handlers.delivery_note.create_reference_ledger_entry",
-			"electro_zone.electro_zone.handlers.delivery_note.auto_invoice_on_out_for_delivery",
-			"electro_zone.electro_zone.handlers.delivery_note.auto_return_stock_on_delivery_failed",
-		],
-		"on_cancel": "electro_zone.electro_zone.handlers.delivery_note.auto_close_so_on_cancel",
+		"before_validate": "electro_zone.electro_zone.utils.prefetch_singles",
+		"validate": "electro_zone.electro_zone.handlers._fused.po_validate",
 	},
 	"Purchase Receipt": {
-		"validate": [
-			"electro_zone.electro_zone.handlers.purchase_receipt.auto_populate_rate",
-			"electro_zone.electro_zone.handlers.purchase_receipt.validate_received_quantity",
-			"electro_zone.electro_zone.handlers.purchase_receipt.strict_po_validation"
-		],
+		"before_validate": "electro_zone.electro_zone.utils.prefetch_singles",
+		"validate": "electro_zone.electro_zone.handlers.purchase_receipt.validate_all",
 		"on_submit": "electro_zone.electro_zone.handlers.purchase_receipt.update_item_stock_fields"
 	},
 	"Stock Entry": {
@@ -206,18 +179,13 @@ doc_events = {
 	},
 	"Payment Entry": {
 		"validate": "electro_zone.electro_zone.handlers.payment_entry.auto_allocate_outstanding_invoices_fifo",
-		"on_submit": [
-			"electro_zone.electro_zone.handlers.payment_entry.balance_topup_and_refund_handler",
-			"electro_zone.electro_zone.handlers.payment_entry.update_so_on_payment"
-		]
+		"on_submit": "electro_zone.electro_zone.handlers._fused.pe_on_submit",
 	},
 	"Sales Invoice": {
+		"before_validate": "electro_zone.electro_zone.utils.prefetch_singles",
 		"before_insert": "electro_zone.electro_zone.handlers.sales_invoice.block_credit_note_if_dn_return_not_received",
 		"before_submit": "electro_zone.electro_zone.handlers.sales_invoice.auto_allocate_unallocated_payment_entries",
-		"on_submit": [
-			"electro_zone.electro_zone.handlers.sales_invoice.auto_allocate_balance",
-			"electro_zone.electro_zone.handlers.sales_invoice.update_so_billing_status_only",
-		],
+		"on_submit": "electro_zone.electro_zone.handlers._fused.si_on_submit",
 	},
 	"Customer": {
 		"validate": "electro_zone.electro_zone.handlers.customer.validate_phone_uniqueness",
@@ -226,6 +194,17 @@ doc_events = {
 		"before_submit": "electro_zone.electro_zone.handlers.customer_quick_create.validate_phone_uniqueness",
 		"on_submit": "electro_zone.electro_zone.handlers.customer_quick_create.auto_create_records",
 	},
+	"Warehouse": {
+		"on_update": "electro_zone.electro_zone.handlers.warehouse.clear_hold_warehouse_cache",
+		"after_rename": "electro_zone.electro_zone.handlers.warehouse.clear_hold_warehouse_cache",
+		"on_trash": "electro_zone.electro_zone.handlers.warehouse.clear_hold_warehouse_cache",
+	},
+	"Company": {
+		"on_update": "electro_zone.electro_zone.handlers.warehouse.clear_hold_warehouse_cache",
+	},
+	"Comment": {
+		"after_insert": "electro_zone.electro_zone.handlers.sales_order.flag_marketplace_sales_order",
+	},
 	"GL Entry": {
 		"on_submit": "electro_zone.electro_zone.handlers.gl_entry.sync_customer_balance_on_gl_submit",
 		"on_cancel": "electro_zone.electro_zone.handlers.gl_entry.sync_customer_balance_on_gl_cancel",
@@ -333,5 +312,12 @@ doc_events = {
 # --------
 # Export fixtures for this app
 
-# fixtures = ["Custom Field", "Property Setter", "Print Format", "Workflow", "Workflow State", "Workflow Action"]
+# Custom Fields and Property Setters ship as module customizations (electro_zone/custom/*.json).
+# If fixtures are enabled, scope each entry to this module so migrate/export-fixtures
+# don't serialize every row on the site:
+# fixtures = [
+# 	{"dt": "Client Script", "filters": [["module", "=", "Electro Zone"]]},
+# 	{"dt": "Print Format", "filters": [["module", "=", "Electro Zone"]]},
+# 	{"dt": "Workflow", "filters": [["document_type", "in", ["Sales Order", "Delivery Note"]]]},
+# ]
 
@@ -0,0 +1,29 @@
+"""
+Backfill custom_auto_created_from_marketplace on Sales Orders that already carry the
+marketplace importer's marker comment
+"""
+
+import frappe
+from frappe.modules.utils import sync_customizations
+
+from electro_zone.electro_zone.handlers.sales_order import MARKETPLACE_ORDER_MARKER
+
+
+def execute():
+	# Custom fields are synced after post_model_sync patches run, so create the column first
+	if not frappe.db.has_column("Sales Order", "custom_auto_created_from_marketplace"):
+		sync_customizations("electro_zone")
+
+	frappe.db.sql(
+		"""
+		UPDATE `tabSales Order`
+		SET custom_auto_created_from_marketplace = 1
+		WHERE name IN (
+			SELECT reference_name
+			FROM `tabComment`
+			WHERE reference_doctype = 'Sales Order'
+				AND content = %s
+		)
+	""",
+		(MARKETPLACE_ORDER_MARKER,),
+	)